@@ -1,30 +1,49 @@
 """
 This script analyzes football player data to determine the most frequent shirt numbers
-by position across different leagues. It provides two main functions:
+by position across different leagues. It provides four main functions:
 
-1. get_top_shirts_by_position: Identifies the most frequent shirt numbers for a specified position.
-2. getall_league_shirt_frequency: Aggregates the shirt number frequencies across all positions in a league.
+1. shirt_histogram: Counts every (position, shirt number) pair in a single `np.bincount` pass.
+2. top_shirts_table: Counts the shirt numbers of all positions in a single pass and keeps the top ones.
+3. get_top_shirts_by_position: Identifies the most frequent shirt numbers for a specified position.
+4. getall_league_shirt_frequency: Aggregates the shirt number frequencies across all positions in a league.
 
-The script can be executed directly to read data from a CSV file, process it, and save the results to a new CSV file.
+The script can be executed directly to read data from a Parquet or CSV file, process it, and save the results to a new CSV file.
 
 Modules:
+    numpy
     pandas
+    os
+    pyarrow (optional, Parquet input and faster CSV parsing)
 
 Functions:
+    shirt_histogram(df: pd.DataFrame) -> tuple
+        Returns (position, shirt number) count and first-appearance matrices of the player data.
+
+    top_shirts_table(df: pd.DataFrame, n: int) -> pd.DataFrame
+        Returns the top `n` shirt numbers and their frequency for every position, computed from shirt_histogram().
+
     get_top_shirts_by_position(df: pd.DataFrame, pos: str, n: int) -> list or tuple
         Returns a tuple or list of tuples of the most frequent shirt number(s) and their frequency for a given position.
         
     getall_league_shirt_frequency(league_df: pd.DataFrame, n: int) -> pd.DataFrame
         Aggregates and returns the shirt number frequencies across all positions in a league.
 
+    read_scraped_data(path: str) -> pd.DataFrame
+        Reads only the `position` and `shirt_no` columns of the scraper's Parquet or CSV output, with compact dtypes.
+
     main()
-        The main function that reads data from 'scraped_data.csv', processes it, and saves the result to 'filename.csv'.
+        The main function that reads data from 'scraped_data.parquet' (or 'scraped_data.csv'), processes it, and saves the result to 'filename.csv'.
 
 Constants:
     POSITION_DICT (dict): Mapping of position abbreviations to full position names.
+    POSITION_FULL_NAMES (list): Full position names, in the order of POSITION_DICT.
+    FULL_TO_ABBR (dict): Mapping of full position names back to their abbreviations.
     UEFA_TOP5_LEAGUE_NAMES (list): List of top 5 UEFA league names.
 """
 
+import os
+
+import numpy as np
 import pandas as pd
 
 POSITION_DICT = {
@@ -41,6 +60,9 @@ POSITION_DICT = {
     "CF": "Centre-Forward",
 }
 
+POSITION_FULL_NAMES = list(POSITION_DICT.values())
+FULL_TO_ABBR = {v: k for k, v in POSITION_DICT.items()}
+
 UEFA_TOP5_LEAGUE_NAMES = [
     "Europe_top5",
     "Premier_League",
@@ -51,12 +73,101 @@ UEFA_TOP5_LEAGUE_NAMES = [
 ]
 
 
+def _position_mask(positions: pd.Series, name: str) -> np.ndarray:
+    """Returns a boolean NumPy mask of `positions == name`, comparing integer codes for categorical columns."""
+    if isinstance(positions.dtype, pd.CategoricalDtype):
+        categories = positions.cat.categories
+        if name not in categories:
+            return np.zeros(len(positions), dtype=bool)
+        return positions.cat.codes.to_numpy() == categories.get_loc(name)
+    return positions.to_numpy() == name
+
+
+def shirt_histogram(df: pd.DataFrame):
+    """
+    Counts every (position, shirt number) pair of the player data in one `np.bincount` pass,
+    and records the row where each pair first appears so ties can be broken like `value_counts()`.
+
+    `df` is expected to hold `position` as a categorical column and `shirt_no` as a `uint8`
+    column (see `read_scraped_data()`), so callers should convert the scraped data once beforehand;
+    other integer `shirt_no` columns are downcast here, and non-integer columns or numbers that don't
+    fit in `uint8` raise a ValueError.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing player data.
+
+    Returns:
+        tuple: Two arrays of shape (len(POSITION_FULL_NAMES), max shirt number + 1). In the first, `[i, s]` is
+        the number of players of position `POSITION_FULL_NAMES[i]` wearing shirt number `s`; in the second,
+        it is the index of the first such player (or the number of players if there is none).
+    """
+    pos_codes = pd.Categorical(df["position"], categories=POSITION_FULL_NAMES).codes
+    shirts = df["shirt_no"].to_numpy()
+    if shirts.dtype != np.uint8:  # Not downcast by read_scraped_data(), e.g. int64 from pd.read_csv()
+        if not np.issubdtype(shirts.dtype, np.integer):
+            raise ValueError(
+                f"shirt_no must be an integer column, got {shirts.dtype}; read the data with read_scraped_data()"
+            )
+        if shirts.size and (shirts.min() < 0 or shirts.max() > np.iinfo(np.uint8).max):
+            raise ValueError("Shirt numbers must be between 0 and 255")
+        shirts = shirts.astype(np.uint8)
+    analyzed = pos_codes >= 0  # Positions outside POSITION_DICT are coded -1
+    pos_codes, shirts = pos_codes[analyzed].astype(np.intp), shirts[analyzed]
+    n_shirts = int(shirts.max(initial=0)) + 1
+    keys = pos_codes * n_shirts + shirts
+    shape = (len(POSITION_FULL_NAMES), n_shirts)
+    hist = np.bincount(keys, minlength=shape[0] * shape[1])
+    first_seen = np.full(hist.shape, keys.size)
+    np.minimum.at(first_seen, keys, np.arange(keys.size))
+    return hist.reshape(shape), first_seen.reshape(shape)
+
+
+def top_shirts_table(df: pd.DataFrame, n: int = 1) -> pd.DataFrame:
+    """
+    Counts shirt numbers for every position in a single pass and keeps the top `n` of each.
+    Ties are broken in favour of the shirt number seen first, as `value_counts()` does.
+    Positions without any players get a single row with shirt number and frequency 0, and so does
+    every position when `n` is less than 1.
+
+    Player data follows the same dtype contract as `shirt_histogram()`.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing player data.
+        n (int): Number of top shirt numbers to keep for each position. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: DataFrame containing full (categorical) position names, shirt numbers, and their
+        frequencies, sorted by frequency (descending) within each position.
+    """
+    if n < 1:  # Nothing to rank, report every position like an empty league
+        df, n = df.iloc[:0], 1
+    hist, first_seen = shirt_histogram(df)
+    top_shirts = np.lexsort((first_seen, -hist))[:, :n]
+    frequencies = np.take_along_axis(hist, top_shirts, axis=1)
+    played = frequencies > 0  # Skip numbers nobody wears
+    played[:, 0] = True  # but keep a (position, 0, 0) row for unplayed positions
+    pos_codes = np.repeat(np.arange(len(POSITION_FULL_NAMES)), top_shirts.shape[1])
+    return pd.DataFrame(
+        {
+            "position": pd.Categorical.from_codes(
+                pos_codes[played.ravel()], categories=POSITION_FULL_NAMES
+            ),
+            "shirt_no": top_shirts[played].astype(np.uint8),
+            "frequency": frequencies[played].astype(np.int32),
+        },
+        copy=False,
+    )
+
+
 def get_top_shirts_by_position(df: pd.DataFrame, pos: str, n: int = 1):
     """
     Returns a tuple or list of tuples of the most frequent `n` shirt number(s) and their frequency for the given `position`.
 
+    Player data follows the same dtype contract as `shirt_histogram()`: a categorical `position`
+    column and a `uint8` `shirt_no` column.
+
     Args:
-        df (pd.DataFrame): DataFrame containing player data.
+        df (pd.DataFrame): DataFrame containing player data, or the output of `top_shirts_table()`.
         pos (str): Abbreviation of the player position.
         n (int): Number of top shirt numbers to return. Defaults to 1.
 
@@ -64,26 +175,22 @@ def get_top_shirts_by_position(df: pd.DataFrame, pos: str, n: int = 1):
         list or tuple: A tuple or list of tuples containing position, shirt number, and frequency.
     """
     position = POSITION_DICT[pos]
-    query = "position == @position"
-    top_shirts_occurences = df.query(query)["shirt_no"].value_counts()[:n]
-    if top_shirts_occurences.empty:
+    if "frequency" not in df.columns:  # Raw player data, only count the players of this position
+        df = top_shirts_table(df[_position_mask(df["position"], position)], n)
+    top_shirts = df[_position_mask(df["position"], position)][:n]
+    if top_shirts.empty or top_shirts["frequency"].iloc[0] == 0:
         return (pos, 0, 0)
-    if n > 1:
-        result = []
-        for i in range(n):
-            result.append(
-                (pos, top_shirts_occurences.index[i], top_shirts_occurences.iloc[i])
-            )
-        return result
-    else:
-        shirt_no = top_shirts_occurences.index[0]
-        frequency = top_shirts_occurences.iloc[0]
-        return (pos, shirt_no, frequency)
+    result = [
+        (pos, shirt_no, frequency)
+        for shirt_no, frequency in zip(top_shirts["shirt_no"], top_shirts["frequency"])
+    ]
+    return result if n > 1 else result[0]
 
 
 def getall_league_shirt_frequency(league_df: pd.DataFrame, n: int = 1):
     """
     Aggregates and returns the shirt number frequencies across all positions in a league.
+    Positions without any players are reported as a single (position, 0, 0) row.
 
     Args:
         league_df (pd.DataFrame): DataFrame containing league data.
@@ -92,13 +199,47 @@ def getall_league_shirt_frequency(league_df: pd.DataFrame, n: int = 1):
     Returns:
         pd.DataFrame: DataFrame containing positions, shirt numbers, and their frequencies.
     """
-    league_data = [get_top_shirts_by_position(league_df, k, n) for k in POSITION_DICT]
-    df = pd.DataFrame(league_data, columns=["position", "shirt_no", "frequency"])
+    df = top_shirts_table(league_df, n)
+    # Rename the 11 categories instead of mapping every row
+    df["position"] = df["position"].cat.rename_categories(FULL_TO_ABBR)
     return df
 
 
+def read_scraped_data(path: str = "scraped_data.csv") -> pd.DataFrame:
+    """
+    Reads the scraper's Parquet or CSV output with only the columns needed for the analysis.
+    CSV files are parsed with the multithreaded pyarrow engine when pyarrow is installed, and the default C engine otherwise.
+
+    Args:
+        path (str): Path of the '.parquet' or CSV file written by the scraper. Defaults to 'scraped_data.csv'.
+
+    Returns:
+        pd.DataFrame: DataFrame with a categorical `position` column and a `uint8` `shirt_no` column.
+    """
+    columns = ["position", "shirt_no"]
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        read_options = {
+            "usecols": columns,
+            "dtype": {"position": "category", "shirt_no": "UInt8"},
+            "na_values": ["-"],  # Players without an assigned shirt number
+        }
+        try:
+            df = pd.read_csv(path, engine="pyarrow", **read_options)
+        except ImportError:
+            df = pd.read_csv(path, **read_options)
+    df = df.dropna(subset=["shirt_no"])
+    # Shirt numbers run from 1 to 99
+    return df.astype({"position": "category", "shirt_no": "uint8"})
+
+
 def main():
-    df = pd.read_csv("scraped_data.csv")  # Read the data csv from scraper as DataFrame
+    # Read the data parquet (or csv) from scraper as DataFrame
+    if os.path.exists("scraped_data.parquet"):
+        df = read_scraped_data("scraped_data.parquet")
+    else:
+        df = read_scraped_data("scraped_data.csv")
     data = getall_league_shirt_frequency(df)  # Apply the function to the df
     data.to_csv("filename.csv", index=False)  # Save df as csv, optional.
 
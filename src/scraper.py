@@ -3,105 +3,297 @@ A web scraper for transfermarkt.com to get players' names, positions, and shirt
 `headers` are a dictionary containing User-Agent data, must be used to scrape transfermarkt
 because they block any python requests.
 
+Fetched pages are cached gzip-compressed under `CACHE_DIR` for `CACHE_EXPIRE_AFTER` seconds,
+so re-running the scraper within a season is served from disk.
+
 Modules:
     requests
     bs4 (BeautifulSoup)
+    lxml
+    concurrent.futures
     csv
+    itertools
+    gzip, hashlib, os, tempfile, time
+    pyarrow (optional, Parquet output)
+    asyncio, httpx + h2 (optional, HTTP/2 scraping)
 
 Functions:
-    get_league_teams_urls(league_url: str, headers: dict, season: int = 2023) -> list
-        Get links to all teams of a certain league given its URL as input. Returns a list of URLs.
+    get_parsed_page(url: str, session: requests.Session, headers: dict, parse: Callable) -> Any
+        Returns the parsed page of the URL, from the on-disk cache when a fresh copy exists. Only pages that parsed are cached.
+
+    parse_league_teams_urls(league_page: bytes) -> list
+        Extracts the URLs of the teams from a league page. Returns a list of URLs.
+
+    parse_squad_data(team_page: bytes) -> list
+        Extracts a team's player data from its page. Returns a list of tuples (name, position, shirt number).
+
+    get_league_teams_urls(league_url: str, session: requests.Session, headers: dict, season: int = 2023) -> list
+        Get links to all teams of a certain league given its URL as input. Returns a list of URLs, memoized per league and season.
         
-    get_squad_data(team_url: str, headers: dict) -> list
+    get_squad_data(team_url: str, session: requests.Session, headers: dict) -> list
         Gets a team's player data given team URL as input. Returns a list of tuples (name, position, shirt number).
         
-    get_all_league_squads_info(league_url: str, headers: dict, season: int = 2023) -> list
-        Applies get_squad_data() to all league teams given the league URL as input. Returns a list of lists containing all the league's player data.
+    iter_all_league_squads_info(league_url: str, session: requests.Session, headers: dict, season: int = 2023) -> Iterator[list]
+        Applies get_squad_data() concurrently to all league teams given the league URL as input. Yields each team's player data in turn.
+        
+    write_league_data_to_csv(league_data: Iterable[list], league_name: str) -> None
+        Convert the league(s) data to a CSV file given the league data and league name, streaming the rows as they arrive. Writes a CSV file to the current directory named under the league's name.
+        
+    write_league_data_to_parquet(league_data: Iterable[list], league_name: str) -> None
+        Convert the league(s) data to a Parquet file given the league data and league name. Writes a Parquet file to the current directory named under the league's name.
+        
+    fetch_parsed_page(client: httpx.AsyncClient, url: str, headers: dict, parse: Callable) -> Any
+        Asynchronous get_parsed_page(), sharing the same on-disk cache.
+        
+    scrape_league_async(client: httpx.AsyncClient, league_url: str, headers: dict, season: int = 2023) -> list
+        Fetches all team pages of a league concurrently over the client's HTTP/2 connection. Returns a list of lists containing all the league's player data.
         
-    write_league_data_to_csv(league_data: list, league_name: str) -> None
-        Convert the league(s) data to a CSV file given the league data and league name. Writes a CSV file to the current directory named under the league's name.
+    scrape_leagues_async(leagues: dict, headers: dict, write_league_data: Callable) -> None
+        Scrapes every league of `leagues` with one HTTP/2 client, and writes each league with `write_league_data`.
         
     main() -> None
-        The main function that sets headers and league URLs, then scrapes data for the leagues and saves them as CSV files.
+        The main function that sets headers, the HTTP session and league URLs, then scrapes data for the leagues and saves them as Parquet files (CSV files without pyarrow).
+        Uses the asynchronous HTTP/2 path when httpx and h2 are installed, and the threaded requests path otherwise.
 """
 
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import html
+from lxml.etree import XPath
+from concurrent.futures import ThreadPoolExecutor
 import csv
+from itertools import chain
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional, CSV is always available
+    pa = pq = None
+
+try:
+    import h2  # noqa: F401, required by httpx for HTTP/2
+    import httpx
+except ImportError:  # The HTTP/2 path is optional, the threaded requests path is always available
+    httpx = None
+
+MAX_WORKERS = 16  # Number of team pages fetched concurrently
+CACHE_DIR = "cache"  # Directory of the gzip-compressed page cache
+CACHE_EXPIRE_AFTER = 86400  # Seconds a cached page stays valid
+MAX_CONNECTIONS = 32  # Connection pool size of the HTTP/2 client
+CSV_BUFFER_SIZE = 1 << 23  # 8 MiB write buffer, so a league is flushed in few large writes
+
+# Team URLs of the leagues scraped so far, keyed by (league URL, header items, season)
+_LEAGUE_TEAMS_URLS = {}
+
+
+def _has_class(name):
+    """Returns an XPath predicate matching elements with the CSS class `name`, like BeautifulSoup's `class_`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
 
+# Only the team link cells of a league page are parsed into the soup
+LEAGUE_TEAMS_STRAINER = SoupStrainer("td", class_="hauptlink no-border-links")
 
-def get_league_teams_urls(league_url, headers, season=2023):
+# Compiled once and reused for every team page. Cached pages carry no HTTP charset, and
+# Transfermarkt serves UTF-8, so don't let lxml guess (it falls back to Latin-1)
+TEAM_PAGE_PARSER = html.HTMLParser(encoding="utf-8")
+SQUAD_TABLE_XP = XPath(f"(//table[{_has_class('items')}])[1]")
+PLAYERS_XP = XPath(f".//td[{_has_class('posrela')}]")
+NUMBERS_XP = XPath(f"//div[{_has_class('rn_nummer')}]")
+NAME_XP = XPath(f"string((.//td[{_has_class('hauptlink')}])[1])")
+POSITION_XP = XPath("string((.//tr)[last()]/td[last()])")  # Last cell of the player's last row
+
+
+def _cache_path(url):
+    """Returns the path of the cache entry of the URL."""
+    url_hash = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{url_hash}.html.gz")
+
+
+def _read_cached_page(url):
+    """Returns the cached page body of the URL, or None if it is not cached or has expired."""
+    cache_path = _cache_path(url)
+    try:
+        if time.time() - os.path.getmtime(cache_path) < CACHE_EXPIRE_AFTER:
+            with open(cache_path, "rb") as file:
+                return gzip.decompress(file.read())
+    except OSError:
+        pass  # Not cached yet
+    return None
+
+
+def _write_cached_page(url, content):
+    """Stores the page body of the URL in the cache."""
+    cache_path = _cache_path(url)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # A unique temp file per writer, so concurrent threads never write into the same file
+    with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as file:
+        file.write(gzip.compress(content))
+    os.replace(file.name, cache_path)  # Never expose a half-written cache entry
+
+
+def get_parsed_page(url, session, headers, parse):
     """
-    Get links to all teams of a certain league given its URL as input.
+    Returns the page of the URL parsed with `parse`, reading the page from the on-disk cache when a fresh copy exists.
+    Fetched pages are stored in `CACHE_DIR` as `<blake2b hash of url>.html.gz`, but only once they parsed successfully,
+    so error and block pages are never served from the cache.
 
     Args:
-        league_url (str): URL of the league.
+        url (str): URL of the page.
+        session (requests.Session): Session used to send the request on a cache miss.
         headers (dict): Dictionary containing User-Agent data.
-        season (int): Season year. Defaults to 2023.
+        parse (Callable): Parser taking the page body, raising if the page is unusable.
 
     Returns:
-        list: List containing the URLs of the teams in the league.
+        The result of `parse`.
+
+    Raises:
+        requests.HTTPError: If the response is an HTTP error (e.g. 429 Too Many Requests).
     """
+    page = _read_cached_page(url)
+    if page is not None:
+        return parse(page)
+    response = session.get(url, headers=headers)
+    response.raise_for_status()
+    result = parse(response.content)
+    _write_cached_page(url, response.content)
+    return result
+
+
+def _league_season_url(league_url, season):
+    """Returns the URL of the league's season page."""
     if "?saison_id=" not in league_url:
         league_url = league_url + f"/plus/?saison_id={season}"
-    league_response = requests.get(league_url, headers=headers)
-    league_soup = BeautifulSoup(league_response.text, "lxml")
+    return league_url
+
+
+def parse_league_teams_urls(league_page):
+    """
+    Extracts the URLs of the teams from a league page.
+
+    Args:
+        league_page (bytes): Body of the league page.
+
+    Returns:
+        list: List containing the URLs of the teams in the league.
+
+    Raises:
+        LookupError: If the page has no team links, e.g. a block or error page.
+    """
+    league_soup = BeautifulSoup(league_page, "lxml", parse_only=LEAGUE_TEAMS_STRAINER)
     league_teams = league_soup.find_all("td", class_="hauptlink no-border-links")
+    if not league_teams:
+        raise LookupError("No team links found")
     urls = [team.find("a").get("href") for team in league_teams]
-    urls = ["".join(["https://www.transfermarkt.com", url]) for url in urls]
-    return urls
+    return ["".join(["https://www.transfermarkt.com", url]) for url in urls]
 
 
-def get_squad_data(team_url, headers):
+def parse_squad_data(team_page):
     """
-    Gets a team's player data given team URL as input.
+    Extracts a team's player data from its page.
 
     Args:
-        team_url (str): URL of the team.
-        headers (dict): Dictionary containing User-Agent data.
+        team_page (bytes): Body of the team page.
 
     Returns:
         list: List of tuples (name, position, shirt number).
+
+    Raises:
+        ValueError: If the page has no squad table, e.g. a block or error page.
     """
     squad_info = []
-    team_response = requests.get(team_url, headers=headers)
-    team_soup = BeautifulSoup(team_response.text, "lxml")
-    squad_table = team_soup.find("table", class_="items")
-    players = squad_table.find_all("td", class_="posrela")
-    number_rows = team_soup.find_all("div", class_="rn_nummer")
-    numbers = [row.text for row in number_rows]
-    numbers.reverse()
-    for player in players:
-        name = player.find("td", class_="hauptlink").text.strip()
-        position = player.find_all("td")[-1].text.strip()
-        shirt_num = numbers.pop()
-        squad_info.append(tuple([name, position, shirt_num]))
+    team_tree = html.fromstring(team_page, parser=TEAM_PAGE_PARSER)
+    squad_tables = SQUAD_TABLE_XP(team_tree)
+    if not squad_tables:
+        raise ValueError("No squad table found")
+    players = PLAYERS_XP(squad_tables[0])
+    numbers = [row.text_content() for row in NUMBERS_XP(team_tree)]
+    for player, shirt_num in zip(players, numbers):
+        name = NAME_XP(player).strip()
+        position = POSITION_XP(player).strip()
+        squad_info.append((name, position, shirt_num))
     return squad_info
 
 
-def get_all_league_squads_info(league_url, headers, season=2023):
+def get_league_teams_urls(league_url, session, headers, season=2023):
     """
-    Applies get_squad_data() to all league teams given the league URL as input.
+    Get links to all teams of a certain league given its URL as input.
+    Results are memoized per (league URL, headers, season), so retries within a run don't re-fetch or re-parse the page,
+    even with a new session; the session itself is not kept alive by the cache.
+    Failures (e.g. a block page without any team links) are not cached, so a later call fetches the page again.
 
     Args:
         league_url (str): URL of the league.
+        session (requests.Session): Session used to send the request.
         headers (dict): Dictionary containing User-Agent data.
         season (int): Season year. Defaults to 2023.
 
     Returns:
-        list: List of lists containing all the league's player data.
+        list: List containing the URLs of the teams in the league.
     """
-    league_links = get_league_teams_urls(league_url, headers, season)
-    all_league_squads = []
-    for team in league_links:
+    cache_key = (league_url, tuple(headers.items()), season)
+    if cache_key not in _LEAGUE_TEAMS_URLS:
+        league_season_url = _league_season_url(league_url, season)
+        try:
+            urls = get_parsed_page(league_season_url, session, headers, parse_league_teams_urls)
+        except (LookupError, requests.RequestException) as err:
+            print("Error: ", err)
+            return []
+        _LEAGUE_TEAMS_URLS[cache_key] = tuple(urls)
+    return list(_LEAGUE_TEAMS_URLS[cache_key])
+
+
+def get_squad_data(team_url, session, headers):
+    """
+    Gets a team's player data given team URL as input.
+
+    Args:
+        team_url (str): URL of the team.
+        session (requests.Session): Session used to send the request.
+        headers (dict): Dictionary containing User-Agent data.
+
+    Returns:
+        list: List of tuples (name, position, shirt number).
+    """
+    return get_parsed_page(team_url, session, headers, parse_squad_data)
+
+
+def iter_all_league_squads_info(league_url, session, headers, season=2023):
+    """
+    Applies get_squad_data() to all league teams given the league URL as input, yielding one team at a time.
+    Team pages are fetched concurrently by up to `MAX_WORKERS` threads sharing `session`.
+    A team that fails to scrape is reported and contributes an empty list.
+
+    Args:
+        league_url (str): URL of the league.
+        session (requests.Session): Session used to send the requests.
+        headers (dict): Dictionary containing User-Agent data.
+        season (int): Season year. Defaults to 2023.
+
+    Yields:
+        list: A team's player data, in the league's team order.
+    """
+
+    def get_team_info(team):
         try:
             print("Processing team at url: ", team)
-            team_info = get_squad_data(team, headers)
+            team_info = get_squad_data(team, session, headers)
             print("Processing done")
         except Exception as err:
             print("Error: ", err)
-        all_league_squads.append(team_info)
-    return all_league_squads
+            team_info = []
+        return team_info
+
+    league_links = get_league_teams_urls(league_url, session, headers, season)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        yield from executor.map(get_team_info, league_links)
 
 
 def write_league_data_to_csv(league_data, league_name):
@@ -109,22 +301,138 @@ def write_league_data_to_csv(league_data, league_name):
     Convert the league(s) data to a CSV file given the league data and league name.
 
     Args:
-        league_data (list): List of lists containing player data for the league.
+        league_data (Iterable[list]): Iterable of lists containing player data for the league,
+            e.g. the generator returned by iter_all_league_squads_info().
         league_name (str): Name of the league.
 
     Writes:
         A CSV file to the current directory named under the league's name.
     """
-    with open(f"{league_name}.csv", "w", encoding="utf-8", newline="") as file:
+    with open(
+        f"{league_name}.csv", "w", encoding="utf-8", newline="", buffering=CSV_BUFFER_SIZE
+    ) as file:
         writer = csv.writer(file)
         writer.writerow(["name", "position", "shirt_no"])
-        for team_data in league_data:
-            writer.writerows(team_data)
+        writer.writerows(chain.from_iterable(league_data))
+
+
+def write_league_data_to_parquet(league_data, league_name):
+    """
+    Convert the league(s) data to a zstd-compressed Parquet file given the league data and league name.
+    Positions are stored dictionary-encoded and shirt numbers as `uint8`, with "-" (no assigned number) as null.
+    Requires pyarrow.
+
+    Args:
+        league_data (Iterable[list]): Iterable of lists containing player data for the league,
+            e.g. the generator returned by iter_all_league_squads_info().
+        league_name (str): Name of the league.
+
+    Writes:
+        A Parquet file to the current directory named under the league's name.
+    """
+    names, positions, shirt_nos = [], [], []
+    for name, position, shirt_num in chain.from_iterable(league_data):
+        names.append(name)
+        positions.append(position)
+        shirt_nos.append(int(shirt_num) if shirt_num.strip().isdigit() else None)
+    table = pa.table(
+        {
+            "name": pa.array(names, pa.string()),
+            "position": pa.array(positions, pa.dictionary(pa.int8(), pa.string())),
+            "shirt_no": pa.array(shirt_nos, pa.uint8()),
+        }
+    )
+    pq.write_table(table, f"{league_name}.parquet", compression="zstd")
+
+
+async def fetch_parsed_page(client, url, headers, parse):
+    """
+    Asynchronous get_parsed_page(), sharing the same on-disk cache: HTTP errors raise,
+    and fetched pages are only cached once they parsed successfully.
+
+    Args:
+        client (httpx.AsyncClient): Client used to send the request on a cache miss.
+        url (str): URL of the page.
+        headers (dict): Dictionary containing User-Agent data.
+        parse (Callable): Parser taking the page body, raising if the page is unusable.
+
+    Returns:
+        The result of `parse`.
+
+    Raises:
+        httpx.HTTPStatusError: If the response is an HTTP error (e.g. 429 Too Many Requests).
+    """
+    page = _read_cached_page(url)
+    if page is not None:
+        return parse(page)
+    response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    result = parse(response.content)
+    _write_cached_page(url, response.content)
+    return result
+
+
+async def scrape_league_async(client, league_url, headers, season=2023):
+    """
+    Fetches all team pages of a league concurrently, multiplexed over the client's HTTP/2 connection(s).
+    Each page is parsed synchronously as soon as it arrives, as parsing is CPU-bound.
+    A league or team that fails to scrape is reported and contributes an empty list.
+
+    Args:
+        client (httpx.AsyncClient): HTTP/2 client used to send the requests.
+        league_url (str): URL of the league.
+        headers (dict): Dictionary containing User-Agent data.
+        season (int): Season year. Defaults to 2023.
+
+    Returns:
+        list: List of lists containing all the league's player data, in the league's team order.
+    """
+    league_season_url = _league_season_url(league_url, season)
+    try:
+        league_links = await fetch_parsed_page(
+            client, league_season_url, headers, parse_league_teams_urls
+        )
+    except (LookupError, httpx.HTTPError) as err:
+        print("Error: ", err)
+        return []
+    squads = await asyncio.gather(
+        *[fetch_parsed_page(client, team, headers, parse_squad_data) for team in league_links],
+        return_exceptions=True,
+    )
+    all_league_squads = []
+    for team, team_info in zip(league_links, squads):
+        print("Processing team at url: ", team)
+        if isinstance(team_info, Exception):
+            print("Error: ", team_info)
+            team_info = []
+        else:
+            print("Processing done")
+        all_league_squads.append(team_info)
+    return all_league_squads
+
+
+async def scrape_leagues_async(leagues, headers, write_league_data):
+    """
+    Scrapes every league with one HTTP/2 client, and writes each league with `write_league_data`.
+    Requires httpx and h2.
+
+    Args:
+        leagues (dict): Mapping of league names to league URLs.
+        headers (dict): Dictionary containing User-Agent data.
+        write_league_data (Callable): Writer taking the league data and league name,
+            e.g. write_league_data_to_csv().
+    """
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(http2=True, limits=limits, follow_redirects=True) as client:
+        for league_name, link in leagues.items():
+            write_league_data(await scrape_league_async(client, link, headers), league_name)
+            print(league_name + " ######### Finished ######### ")
 
 
 def main():
     HEADERS = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36 Edg/122.0.0.0"
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36 Edg/122.0.0.0",
+        "Accept-Encoding": "gzip, deflate",
     }
     EUROPE_TOP_5_LEAGUES = {
         "Premier_League": "https://www.transfermarkt.com/premier-league/startseite/wettbewerb/GB1",
@@ -133,9 +441,19 @@ def main():
         "Serie_A": "https://www.transfermarkt.com/serie-a/startseite/wettbewerb/IT1",
         "Ligue_1": "https://www.transfermarkt.com/ligue-1/startseite/wettbewerb/FR1",
     }
-    # Usage Example: Scrape Europe top 5 leagues, and save them as separate csv files
+    # Prefer Parquet, which the analysis reads much faster, and fall back to CSV without pyarrow
+    write_league_data = write_league_data_to_parquet if pq else write_league_data_to_csv
+    if httpx is not None:
+        # Multiplex the requests over HTTP/2 connections
+        asyncio.run(scrape_leagues_async(EUROPE_TOP_5_LEAGUES, HEADERS, write_league_data))
+        return
+    # Otherwise reuse pooled keep-alive connections across all requests
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=MAX_WORKERS)  # One pooled connection per worker thread
+    session.mount("https://", adapter)
+    # Usage Example: Scrape Europe top 5 leagues, and save them as separate parquet/csv files
     for league_name, link in EUROPE_TOP_5_LEAGUES.items():
-        write_league_data_to_csv(get_all_league_squads_info(link, HEADERS), league_name)
+        write_league_data(iter_all_league_squads_info(link, session, HEADERS), league_name)
         print(league_name + " ######### Finished ######### ")
 
 